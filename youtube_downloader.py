@@ -1,18 +1,41 @@
 import tkinter as tk
 from tkinter import filedialog, ttk, messagebox
 import threading
+import asyncio
+import argparse
+import sqlite3
+import socket
+import subprocess
+import sys
 import os
 import re
+import shutil
 import time
 import logging
+import json
 from urllib.parse import urlparse, parse_qs
-from concurrent.futures import ThreadPoolExecutor
-from dataclasses import dataclass
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
 from typing import Dict, List, Optional, Set
 import yt_dlp
 import webbrowser
+import urllib.request
+from collections import OrderedDict
 from functools import partial
 
+try:
+    import fcntl  # Chỉ có trên Linux/macOS, dùng cho reflink
+except ImportError:
+    fcntl = None
+
+try:
+    from PIL import Image, ImageTk
+except ImportError:  # Không có Pillow thì bỏ qua ảnh thu nhỏ
+    Image = ImageTk = None
+
+
+APP_DATA_DIR = os.path.join(os.path.expanduser("~"), ".youtube_downloader")
+
 
 @dataclass
 class VideoInfo:
@@ -24,6 +47,12 @@ class VideoInfo:
     status: str = "Chờ tải"
     progress: str = "0%"
     size: str = "--"
+    duration_seconds: int = 0
+    estimated_sizes: Dict[str, int] = field(default_factory=dict)
+    uploader: str = ""
+    view_count: int = 0
+    thumbnail: str = ""
+    formats: List[str] = field(default_factory=list)
 
 
 class ProgressTracker:
@@ -63,11 +92,557 @@ class ProgressTracker:
             return (self.total_bytes_downloaded / self.total_bytes * 100) if self.total_bytes > 0 else 0
 
 
+@dataclass
+class BulkImportSummary:
+    """Counters collected while streaming a bulk URL file"""
+    valid: int = 0
+    invalid: int = 0
+    duplicate: int = 0
+    playlists: int = 0
+    playlist_videos: int = 0
+    playlists_failed: int = 0
+
+
+class DiskSpaceGuard:
+    """Admission control: reserves disk space for queued, running and post-processing downloads"""
+    
+    HEADROOM_BYTES = 512 * 1024 * 1024  # Luôn chừa lại trên ổ đĩa
+    FALLBACK_DURATION = 600             # Giây, khi không biết thời lượng
+    # Bitrate ước lượng (byte/giây) khi yt-dlp không trả về filesize
+    FALLBACK_BYTES_PER_SECOND = {"480p": 150_000, "720p": 300_000, "1080p": 600_000, "mp3": 40_000}
+    
+    def __init__(self, headroom_bytes: int = HEADROOM_BYTES):
+        self.lock = threading.Lock()
+        self.headroom_bytes = headroom_bytes
+        self.reserved: Dict[str, int] = {}
+        self.written: Dict[str, Dict[str, int]] = {}
+    
+    def estimate(self, video: "VideoInfo", quality: str) -> int:
+        """Estimate peak disk usage of one job, including merge/convert temp files"""
+        size = video.estimated_sizes.get(quality, 0)
+        if not size:
+            bitrate = self.FALLBACK_BYTES_PER_SECOND.get(quality, self.FALLBACK_BYTES_PER_SECOND["1080p"])
+            size = bitrate * (video.duration_seconds or self.FALLBACK_DURATION)
+        # Các file tạm (video + audio, hoặc audio gốc trước khi chuyển mp3) tồn tại cùng file kết quả
+        return size * 2
+    
+    def _outstanding(self) -> int:
+        """Reserved bytes that are not yet written to disk (caller holds the lock)"""
+        return sum(
+            max(reserved - sum(self.written.get(video_id, {}).values()), 0)
+            for video_id, reserved in self.reserved.items()
+        )
+    
+    def try_reserve(self, video_id: str, nbytes: int, folder: str) -> bool:
+        """Reserve space for a job if the folder's disk has enough headroom"""
+        with self.lock:
+            try:
+                free = shutil.disk_usage(folder).free
+            except OSError:
+                # Thư mục chưa tồn tại (yt-dlp sẽ tự tạo): không đo được thì không chặn
+                free = None
+            if free is not None and free - self._outstanding() - self.headroom_bytes < nbytes:
+                return False
+            self.reserved[video_id] = nbytes
+            self.written[video_id] = {}
+            return True
+    
+    def idle(self) -> bool:
+        """True when no job holds a reservation, i.e. waiting cannot free any space"""
+        with self.lock:
+            return not self.reserved
+    
+    def update_written(self, video_id: str, filename: str, downloaded: int):
+        """Record bytes already written for a job (per temp file)"""
+        with self.lock:
+            if video_id in self.written:
+                self.written[video_id][filename] = downloaded
+    
+    def release(self, video_id: str):
+        """Release a job's reservation"""
+        with self.lock:
+            self.reserved.pop(video_id, None)
+            self.written.pop(video_id, None)
+    
+    def snapshot(self, folder: str) -> tuple[int, int]:
+        """Return (reserved bytes, free bytes) for display"""
+        with self.lock:
+            reserved = sum(self.reserved.values())
+        try:
+            free = shutil.disk_usage(folder).free
+        except OSError:
+            free = 0
+        return reserved, free
+
+
+class MediaStore:
+    """Index of downloaded files keyed by video ID and format, shared across output folders
+    
+    The index is a SQLite file so the GUI and worker processes see each other's files.
+    """
+    
+    FICLONE = 0x40049409  # ioctl reflink của Linux (btrfs, xfs)
+    
+    def __init__(self, index_path: str = os.path.join(APP_DATA_DIR, "media_store.db")):
+        self.index_path = index_path
+        self._local = threading.local()
+        self.logger = logging.getLogger(__name__)
+        try:
+            os.makedirs(os.path.dirname(index_path), exist_ok=True)
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("CREATE TABLE IF NOT EXISTS files (key TEXT NOT NULL, path TEXT NOT NULL, "
+                             "PRIMARY KEY (key, path))")
+        except (OSError, sqlite3.Error) as e:
+            self.logger.warning(f"Không thể mở chỉ mục kho: {e}")
+    
+    def _connect(self) -> sqlite3.Connection:
+        """One connection per thread, autocommit"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.index_path, timeout=30, isolation_level=None)
+            self._local.conn = conn
+        return conn
+    
+    @staticmethod
+    def make_key(video_id: str, quality: str) -> str:
+        """Store key for one video in one format"""
+        return f"{video_id}:{quality}"
+    
+    def lookup(self, key: str) -> Optional[str]:
+        """Return an existing file for the key, dropping paths that no longer exist"""
+        try:
+            conn = self._connect()
+            paths = [row[0] for row in conn.execute("SELECT path FROM files WHERE key = ? ORDER BY rowid", (key,))]
+            for path in paths:
+                if os.path.isfile(path):
+                    return path
+                conn.execute("DELETE FROM files WHERE key = ? AND path = ?", (key, path))
+        except sqlite3.Error as e:
+            self.logger.warning(f"Không thể đọc chỉ mục kho: {e}")
+        return None
+    
+    def add(self, key: str, path: str):
+        """Record a file produced for the key"""
+        try:
+            self._connect().execute(
+                "INSERT OR IGNORE INTO files (key, path) VALUES (?, ?)", (key, os.path.abspath(path))
+            )
+        except sqlite3.Error as e:
+            self.logger.warning(f"Không thể lưu chỉ mục kho: {e}")
+    
+    def place(self, key: str, source: str, folder: str) -> str:
+        """Materialize a stored file in folder: hardlink, then reflink, then fast copy"""
+        target = os.path.join(folder, os.path.basename(source))
+        if os.path.exists(target):
+            if os.path.samefile(source, target):
+                return target
+            raise FileExistsError(f"{target} đã tồn tại")
+        
+        os.makedirs(folder, exist_ok=True)
+        try:
+            os.link(source, target)
+        except OSError:
+            if not self._reflink(source, target):
+                shutil.copyfile(source, target)
+        self.add(key, target)
+        return target
+    
+    def _reflink(self, source: str, target: str) -> bool:
+        """Copy-on-write clone where the filesystem supports it"""
+        if fcntl is None:
+            return False
+        try:
+            with open(source, "rb") as src, open(target, "wb") as dst:
+                fcntl.ioctl(dst.fileno(), self.FICLONE, src.fileno())
+            return True
+        except OSError:
+            if os.path.exists(target):
+                os.remove(target)
+            return False
+
+
+@dataclass
+class HostStats:
+    """Per-host counters for one control window"""
+    errors: int = 0
+    streams: int = 0
+    bytes: int = 0
+    latency_total: float = 0.0
+    latency_count: int = 0
+
+
+class AdaptiveConcurrency:
+    """AIMD limit on parallel downloads driven by per-host error rate, latency and throughput"""
+    
+    MIN_LIMIT = 1
+    MAX_LIMIT = 8
+    INITIAL_LIMIT = 4
+    WINDOW_SECONDS = 10
+    ERROR_RATE_THRESHOLD = 0.25   # Tỉ lệ lỗi/luồng của một host để giảm một nửa
+    MIN_ERRORS = 2
+    LATENCY_SPIKE_FACTOR = 2.0    # Độ trễ gấp N lần mức nền thì giảm
+    THROUGHPUT_GAIN = 1.05        # Thông lượng phải tăng ít nhất 5% để tăng tiếp
+    TRANSIENT_ERROR_PATTERN = re.compile(
+        r"timed out|10054|connection reset|forcibly closed|remote end closed|"
+        r"incompleteread|http error (429|5\d\d)",
+        re.IGNORECASE
+    )
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.limit = self.INITIAL_LIMIT
+        self.reason = "Mặc định"
+        self.hosts: Dict[str, HostStats] = {}
+        self.video_hosts: Dict[str, str] = {}
+        self.stream_bytes: Dict[tuple[str, str], int] = {}
+        self.active_streams: Set[tuple[str, str]] = set()
+        self.baseline_latency = 0.0
+        self.prev_throughput = 0.0
+        self.last_action = ""
+    
+    def _stats(self, host: str) -> HostStats:
+        return self.hosts.setdefault(host, HostStats())
+    
+    def record_progress(self, video_id: str, url: str, filename: str, downloaded: int,
+                        elapsed: Optional[float] = None):
+        """Record bytes from a progress hook (any thread)
+        
+        elapsed is yt-dlp's time since the stream's HTTP request started; on a stream's
+        first hook it is the first-byte latency, free of extract_info and store-hit time.
+        """
+        host = urlparse(url).netloc or "unknown"
+        key = (video_id, filename)
+        with self.lock:
+            stats = self._stats(host)
+            self.video_hosts[video_id] = host
+            stats.bytes += max(downloaded - self.stream_bytes.get(key, 0), 0)
+            self.stream_bytes[key] = downloaded
+            if key not in self.active_streams:
+                self.active_streams.add(key)
+                stats.streams += 1
+                if elapsed is not None:
+                    stats.latency_total += elapsed
+                    stats.latency_count += 1
+    
+    def record_finished(self, video_id: str, filename: str):
+        """Forget a completed stream"""
+        with self.lock:
+            self.stream_bytes.pop((video_id, filename), None)
+            self.active_streams.discard((video_id, filename))
+    
+    def record_job_ended(self, video_id: str):
+        """Forget every stream of a job that ended, including failed or cancelled ones"""
+        with self.lock:
+            for key in [key for key in self.stream_bytes if key[0] == video_id]:
+                self.stream_bytes.pop(key, None)
+            self.active_streams = {key for key in self.active_streams if key[0] != video_id}
+            self.video_hosts.pop(video_id, None)
+    
+    def record_error(self, video_id: str, message: str) -> bool:
+        """Count a transient network error for the video's host; False if it is not one"""
+        if not self.TRANSIENT_ERROR_PATTERN.search(message):
+            return False
+        with self.lock:
+            self._stats(self.video_hosts.get(video_id, "unknown")).errors += 1
+        return True
+    
+    def evaluate(self, in_flight: int) -> Optional[str]:
+        """Close the window and adjust the limit; return the reason if it changed"""
+        with self.lock:
+            hosts, self.hosts = self.hosts, {}
+            # Luồng còn đang tải được tính lại cho cửa sổ kế tiếp
+            for video_id, _ in self.active_streams:
+                self._stats(self.video_hosts.get(video_id, "unknown")).streams += 1
+        
+        throughput = sum(stats.bytes for stats in hosts.values()) / self.WINDOW_SECONDS
+        latency_total = sum(stats.latency_total for stats in hosts.values())
+        latency_count = sum(stats.latency_count for stats in hosts.values())
+        latency = latency_total / latency_count if latency_count else 0.0
+        
+        worst_host, worst = max(hosts.items(), key=lambda item: item[1].errors, default=("", HostStats()))
+        error_rate = worst.errors / max(worst.streams + worst.errors, 1)
+        
+        old_limit = self.limit
+        if worst.errors >= self.MIN_ERRORS and error_rate >= self.ERROR_RATE_THRESHOLD:
+            self.limit = max(self.MIN_LIMIT, self.limit // 2)
+            reason = f"{worst.errors} lỗi mạng tại {worst_host}"
+            self.last_action = "decrease"
+        elif self.baseline_latency and latency > self.baseline_latency * self.LATENCY_SPIKE_FACTOR:
+            self.limit = max(self.MIN_LIMIT, self.limit // 2)
+            reason = f"độ trễ tăng {latency:.1f}s (nền {self.baseline_latency:.1f}s)"
+            self.last_action = "decrease"
+        elif (self.last_action == "increase" and self.prev_throughput
+              and throughput < self.prev_throughput / self.THROUGHPUT_GAIN):
+            # Tăng luồng không giúp ích: lùi lại một bước
+            self.limit = max(self.MIN_LIMIT, self.limit - 1)
+            reason = f"thông lượng giảm còn {throughput / (1024 * 1024):.1f} MB/s"
+            self.last_action = "decrease"
+        elif (self.last_action != "decrease" and in_flight >= self.limit and throughput > 0
+              and throughput >= self.prev_throughput * self.THROUGHPUT_GAIN):
+            self.limit = min(self.MAX_LIMIT, self.limit + 1)
+            reason = f"thông lượng tăng lên {throughput / (1024 * 1024):.1f} MB/s"
+            self.last_action = "increase"
+        else:
+            # Sau một lần giảm, chờ một cửa sổ rồi mới thử tăng lại
+            self.last_action = ""
+            reason = ""
+        
+        if latency_count:
+            self.baseline_latency = (latency if not self.baseline_latency
+                                     else 0.8 * self.baseline_latency + 0.2 * latency)
+        if throughput > 0:
+            self.prev_throughput = throughput
+        
+        if self.limit == old_limit:
+            return None
+        self.reason = reason
+        return reason
+
+
+class DownloadOrchestrator:
+    """Runs an asyncio event loop in a background thread to coordinate analysis and download jobs"""
+    
+    def __init__(self, executor: ThreadPoolExecutor, concurrency: AdaptiveConcurrency):
+        self.executor = executor
+        self.concurrency = concurrency
+        self.on_limit_change = None  # callback(limit, reason), gọi trên loop
+        self.logger = logging.getLogger(__name__)
+        self.loop = asyncio.new_event_loop()
+        self.in_flight = 0
+        self._slot_changed = asyncio.Event()
+        self._control_task: Optional[asyncio.Task] = None
+        self._resumed = asyncio.Event()
+        self._resumed.set()
+        self._space_changed = asyncio.Event()
+        threading.Thread(target=self._run, daemon=True).start()
+    
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+    
+    def submit(self, coro):
+        """Schedule a coroutine from any thread"""
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        future.add_done_callback(self._log_failure)
+        return future
+    
+    def _log_failure(self, future):
+        if not future.cancelled() and future.exception():
+            self.logger.error(f"Background task failed: {future.exception()}")
+    
+    def call_soon(self, callback, *args):
+        """Run a callback on the loop from any thread"""
+        self.loop.call_soon_threadsafe(callback, *args)
+    
+    async def run_download(self, func, *args):
+        """Run a blocking yt-dlp download on the download executor"""
+        return await self.loop.run_in_executor(self.executor, partial(func, *args))
+    
+    async def run_analysis(self, func, *args):
+        """Run blocking analysis work on the loop's default executor"""
+        return await self.loop.run_in_executor(None, partial(func, *args))
+    
+    async def acquire_slot(self):
+        """Wait until in-flight downloads are below the adaptive limit"""
+        while self.in_flight >= self.concurrency.limit:
+            self._slot_changed.clear()
+            await self._slot_changed.wait()
+        self.in_flight += 1
+        if self._control_task is None:
+            self._control_task = self.loop.create_task(self._control_loop())
+    
+    def release_slot(self):
+        self.in_flight -= 1
+        self._slot_changed.set()
+    
+    async def _control_loop(self):
+        """Re-evaluate the concurrency limit once per window while downloads are running"""
+        try:
+            while self.in_flight > 0:
+                await asyncio.sleep(self.concurrency.WINDOW_SECONDS)
+                reason = self.concurrency.evaluate(self.in_flight)
+                if reason is not None:
+                    self._slot_changed.set()
+                    if self.on_limit_change:
+                        self.on_limit_change(self.concurrency.limit, reason)
+        finally:
+            self._control_task = None
+    
+    def set_paused(self, paused: bool):
+        """Pause or resume job admission from any thread"""
+        self.call_soon(self._resumed.clear if paused else self._resumed.set)
+    
+    async def wait_resumed(self):
+        await self._resumed.wait()
+    
+    def notify_space_changed(self):
+        """Wake jobs waiting for disk space (call on the loop)"""
+        self._space_changed.set()
+    
+    async def wait_space_changed(self, timeout: float):
+        """Wait for a release/cancel, or until timeout to re-check space freed outside the app"""
+        self._space_changed.clear()
+        try:
+            await asyncio.wait_for(self._space_changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+    
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+class ThumbnailCache:
+    """Bounded LRU of decoded thumbnails in memory, backed by a disk cache of the raw images"""
+    
+    ROW_SIZE = (64, 36)        # Ảnh trong Treeview
+    DETAIL_SIZE = (192, 108)   # Ảnh trong khung chi tiết
+    MAX_MEMORY_BYTES = 48 * 1024 * 1024
+    FETCH_TIMEOUT = 10
+    FETCH_WORKERS = 2          # Luồng riêng, không chiếm executor phân tích
+    
+    def __init__(self, cache_dir: str = os.path.join(APP_DATA_DIR, "thumbnails"),
+                 max_bytes: int = MAX_MEMORY_BYTES):
+        self.lock = threading.Lock()
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.used_bytes = 0
+        self.images: "OrderedDict[str, tuple[tuple, int]]" = OrderedDict()
+        self.failed: Dict[str, str] = {}  # video_id -> URL đã tải lỗi, không thử lại khi cuộn
+        self.logger = logging.getLogger(__name__)
+    
+    @staticmethod
+    def url_for(video: "VideoInfo") -> str:
+        """Thumbnail URL from yt-dlp, or YouTube's default one for videos not analyzed yet"""
+        return video.thumbnail or f"https://i.ytimg.com/vi/{video.id}/mqdefault.jpg"
+    
+    def get(self, video_id: str) -> Optional[tuple]:
+        """Return (row image, detail image) if decoded images are in memory"""
+        with self.lock:
+            entry = self.images.get(video_id)
+            if entry is None:
+                return None
+            self.images.move_to_end(video_id)
+            return entry[0]
+    
+    def has_failed(self, video_id: str, url: str) -> bool:
+        """True if this thumbnail URL already failed to load"""
+        with self.lock:
+            return self.failed.get(video_id) == url
+    
+    def load(self, video_id: str, url: str) -> Optional[tuple]:
+        """Fetch (disk cache first) and decode a thumbnail; blocking, call off the Tk thread"""
+        images = self.get(video_id)
+        if images is not None or Image is None or self.has_failed(video_id, url):
+            return images
+        
+        path = os.path.join(self.cache_dir, f"{video_id}.img")
+        try:
+            if not os.path.isfile(path):
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with urllib.request.urlopen(url, timeout=self.FETCH_TIMEOUT) as response:
+                    data = response.read()
+                tmp_path = path + ".tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            
+            with Image.open(path) as source:
+                detail = source.convert("RGB")
+            detail.thumbnail(self.DETAIL_SIZE)
+            row = detail.copy()
+            row.thumbnail(self.ROW_SIZE)
+        except Exception as e:
+            self.logger.warning(f"Cannot load thumbnail for {video_id}: {e}")
+            with self.lock:
+                self.failed[video_id] = url
+            return None
+        
+        images = (row, detail)
+        self._put(video_id, images, (row.width * row.height + detail.width * detail.height) * 3)
+        return images
+    
+    def _put(self, video_id: str, images: tuple, nbytes: int):
+        with self.lock:
+            if video_id in self.images:
+                return
+            self.images[video_id] = (images, nbytes)
+            self.used_bytes += nbytes
+            while self.used_bytes > self.max_bytes and len(self.images) > 1:
+                _, (_, evicted_bytes) = self.images.popitem(last=False)
+                self.used_bytes -= evicted_bytes
+
+
+class EventBroadcaster:
+    """Fans job events out to asyncio subscribers without blocking the publishing threads"""
+    
+    QUEUE_SIZE = 256       # Sự kiện tối đa chờ gửi cho mỗi subscriber
+    FLUSH_INTERVAL = 0.2   # Giây, gom các sự kiện tiến độ trước khi gửi
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.subscribers: Set[asyncio.Queue] = set()
+        self._pending_events: List[dict] = []
+        self._pending_progress: Dict[str, dict] = {}
+        self._flush_scheduled = False
+    
+    def attach(self, loop: asyncio.AbstractEventLoop):
+        """Bind to the event loop that owns the subscriber queues"""
+        self.loop = loop
+    
+    def publish(self, event: dict, coalesce_key: Optional[str] = None):
+        """Queue an event from any thread; events with the same coalesce_key replace each other"""
+        if self.loop is None or not self.subscribers:
+            return
+        with self.lock:
+            if coalesce_key is not None:
+                self._pending_progress[coalesce_key] = event
+            else:
+                # Trạng thái mới thay thế tiến độ cũ của cùng video
+                self._pending_progress.pop(event.get("id"), None)
+                self._pending_events.append(event)
+            if self._flush_scheduled:
+                return
+            self._flush_scheduled = True
+        self.loop.call_soon_threadsafe(self.loop.call_later, self.FLUSH_INTERVAL, self._flush)
+    
+    def _flush(self):
+        """Deliver pending events to every subscriber (runs on the loop)"""
+        with self.lock:
+            events = self._pending_events + list(self._pending_progress.values())
+            self._pending_events = []
+            self._pending_progress = {}
+            self._flush_scheduled = False
+        
+        for queue in list(self.subscribers):
+            for event in events:
+                # Subscriber chậm chỉ mất sự kiện cũ của chính nó
+                if queue.full():
+                    queue.get_nowait()
+                queue.put_nowait(event)
+    
+    def subscribe(self) -> asyncio.Queue:
+        """Register a subscriber queue (call on the loop)"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.QUEUE_SIZE)
+        self.subscribers.add(queue)
+        return queue
+    
+    def unsubscribe(self, queue: asyncio.Queue):
+        """Remove a subscriber queue (call on the loop)"""
+        self.subscribers.discard(queue)
+
+
 class URLValidator:
     """Validates and cleans YouTube URLs"""
     
     YOUTUBE_PATTERN = re.compile(r"^(https?://)?(www\.)?(youtube\.com|youtu\.be)/")
     WATCH_URL_PATTERN = re.compile(r"(https?://www\.youtube\.com/watch\?v=[\w-]+)")
+    VIDEO_ID_PATTERN = re.compile(r"^[\w-]{11}$")
+    PLAYLIST_ID_PATTERN = re.compile(r"^[\w-]{2,}$")
+    YOUTUBE_HOSTS = {"youtube.com", "www.youtube.com", "m.youtube.com", "music.youtube.com"}
+    # Các dạng đường dẫn chứa ID video ngay sau tiền tố: /shorts/<id>, /embed/<id>, ...
+    VIDEO_PATH_PREFIXES = ("shorts", "embed", "live", "v")
     
     @classmethod
     def is_valid_youtube_url(cls, url: str) -> bool:
@@ -96,13 +671,68 @@ class URLValidator:
                 invalid_urls.append(url)
         
         return valid_urls, invalid_urls
+    
+    @classmethod
+    def parse_url(cls, url: str) -> Optional[tuple[str, str]]:
+        """Canonicalize a YouTube URL to ("video", id) or ("playlist", id), None if invalid"""
+        url = url.strip()
+        if not url:
+            return None
+        if "://" not in url:
+            url = "https://" + url
+        
+        parsed = urlparse(url)
+        host = parsed.netloc.lower().split(":")[0]
+        path_parts = [part for part in parsed.path.split("/") if part]
+        query_params = parse_qs(parsed.query)
+        
+        video_id = None
+        if host in ("youtu.be", "www.youtu.be"):
+            video_id = path_parts[0] if path_parts else None
+        elif host in cls.YOUTUBE_HOSTS:
+            if path_parts and path_parts[0] == "watch":
+                video_id = query_params.get("v", [None])[0]
+            elif len(path_parts) >= 2 and path_parts[0] in cls.VIDEO_PATH_PREFIXES:
+                video_id = path_parts[1]
+        else:
+            return None
+        
+        # Link có cả v= và list= (kèm &index=, &t=) được xem là một video
+        if video_id:
+            return ("video", video_id) if cls.VIDEO_ID_PATTERN.match(video_id) else None
+        
+        playlist_id = query_params.get("list", [None])[0]
+        if playlist_id and cls.PLAYLIST_ID_PATTERN.match(playlist_id):
+            return ("playlist", playlist_id)
+        return None
+    
+    @staticmethod
+    def canonical_url(kind: str, item_id: str) -> str:
+        """Build the canonical URL for a parsed video or playlist ID"""
+        if kind == "playlist":
+            return f"https://www.youtube.com/playlist?list={item_id}"
+        return f"https://www.youtube.com/watch?v={item_id}"
 
 
 class YouTubeDownloaderApp:
     """Main application class for YouTube downloader"""
     
-    def __init__(self, root):
+    BULK_IMPORT_BATCH = 500        # Số video chèn vào Treeview mỗi lần
+    BULK_IMPORT_STATUS_EVERY = 5000  # Cập nhật trạng thái sau mỗi N dòng
+    DISK_RECHECK_SECONDS = 5         # Kiểm tra lại dung lượng trống khi đang chờ
+    MAX_DOWNLOAD_RETRIES = 2
+    RETRY_DELAY_SECONDS = 5          # Nhân đôi sau mỗi lần thử lại
+    QUEUE_POLL_SECONDS = 1           # Chu kỳ đọc tiến độ từ hàng đợi chung
+    QUEUE_STATUSES = {"queued": "Chờ worker", "running": "Đang tải", "done": "Hoàn tất",
+                      "failed": "Lỗi", "cancelled": "Đã huỷ"}
+    PREFETCH_AHEAD = 20              # Số dòng tải trước ảnh thu nhỏ phía dưới vùng đang hiển thị
+    PREFETCH_DEBOUNCE_MS = 150
+    MAX_ROW_PHOTOS = 300             # Số ảnh Tk giữ cho các dòng Treeview
+    QUALITY_HEIGHTS = {"480p": 480, "720p": 720, "1080p": 1080}
+    
+    def __init__(self, root, job_queue: Optional["JobQueue"] = None):
         self.root = root
+        self.job_queue = job_queue  # Có thì giao việc tải cho các worker process
         self._setup_window()
         self._setup_logging()
         
@@ -110,9 +740,26 @@ class YouTubeDownloaderApp:
         self.videos: Dict[str, VideoInfo] = {}
         self.selected_items: Set[str] = set()
         self.progress_tracker = ProgressTracker()
-        self.executor = ThreadPoolExecutor(max_workers=4)
+        self.disk_guard = DiskSpaceGuard()
+        self.media_store = MediaStore()
+        self.thumbnail_cache = ThumbnailCache()
+        self.thumbnail_executor = ThreadPoolExecutor(max_workers=ThumbnailCache.FETCH_WORKERS)
+        self.row_photos: "OrderedDict[str, ImageTk.PhotoImage]" = OrderedDict()
+        self.details_photo = None
+        self._thumb_pending: Set[str] = set()
+        self._prefetch_after = None
+        self.cancelled_ids: Set[str] = set()
+        self.concurrency = AdaptiveConcurrency()
+        self.executor = ThreadPoolExecutor(max_workers=AdaptiveConcurrency.MAX_LIMIT)
+        self.orchestrator = DownloadOrchestrator(self.executor, self.concurrency)
+        self.orchestrator.on_limit_change = self._on_concurrency_change
+        self.events = EventBroadcaster()
+        self.events.attach(self.orchestrator.loop)
         self.pause_event = threading.Event()
         self.pause_event.set()  # Cho phép chạy mặc định
+        if self.job_queue is not None:
+            # Cờ tạm dừng lưu trong hàng đợi có thể còn từ phiên trước: đồng bộ với GUI vừa mở
+            self.job_queue.set_paused(False)
         
         # UI variables
         self.folder_var = tk.StringVar()
@@ -127,8 +774,8 @@ class YouTubeDownloaderApp:
         self.root.title("YouTube Downloader - Tải video YouTube")
 
         # Kích thước cửa sổ
-        width = 970
-        height = 550
+        width = 1220
+        height = 600
 
         # Lấy kích thước màn hình
         screen_width = self.root.winfo_screenwidth()
@@ -205,6 +852,7 @@ class YouTubeDownloaderApp:
         self._create_input_section()
         self._create_options_section()
         self._create_video_list()
+        self._create_details_pane()
         self._create_buttons()
         self._create_status_section()
         self._configure_grid()
@@ -214,8 +862,11 @@ class YouTubeDownloaderApp:
         tk.Label(self.root, text="URL YouTube (mỗi dòng 1 link):").grid(
             row=0, column=0, sticky='w', padx=10, pady=5
         )
+        tk.Button(self.root, text="Nhập hàng loạt...", command=self._bulk_import).grid(
+            row=0, column=5, columnspan=3, sticky='e', padx=10, pady=5
+        )
         self.url_text = tk.Text(self.root, height=5, width=100)
-        self.url_text.grid(row=1, column=0, columnspan=7, padx=10, sticky='ew')
+        self.url_text.grid(row=1, column=0, columnspan=8, padx=10, sticky='ew')
     
     def _create_options_section(self):
         """Create options section (mode, folder, quality)"""
@@ -268,7 +919,13 @@ class YouTubeDownloaderApp:
     def _create_video_list(self):
         """Create video list treeview"""
         columns = ("Chọn", "ID", "Tiêu đề", "Thời lượng", "Trạng thái", "Tiến độ", "Kích thước")
-        self.tree = ttk.Treeview(self.root, columns=columns, show="headings", height=12)
+        if Image is not None:
+            # Cột #0 chứa ảnh thu nhỏ, dòng cao hơn để vừa ảnh
+            ttk.Style(self.root).configure("Treeview", rowheight=ThumbnailCache.ROW_SIZE[1] + 4)
+            self.tree = ttk.Treeview(self.root, columns=columns, show="tree headings", height=8)
+            self.tree.column("#0", width=ThumbnailCache.ROW_SIZE[0] + 10, stretch=False)
+        else:
+            self.tree = ttk.Treeview(self.root, columns=columns, show="headings", height=12)
         
         # Configure columns
         column_widths = {"Chọn": 60, "ID": 120, "Tiêu đề": 200, "Thời lượng": 80, 
@@ -280,7 +937,12 @@ class YouTubeDownloaderApp:
         
         # Add scrollbar
         scrollbar = ttk.Scrollbar(self.root, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscrollcommand=scrollbar.set)
+        
+        def on_scroll(first, last):
+            scrollbar.set(first, last)
+            self._schedule_prefetch()
+        
+        self.tree.configure(yscrollcommand=on_scroll)
         
         self.tree.grid(row=6, column=0, columnspan=6, padx=10, pady=10, sticky='nsew')
         scrollbar.grid(row=6, column=6, sticky='ns', pady=10)
@@ -288,16 +950,31 @@ class YouTubeDownloaderApp:
         # Bind events
         self.tree.bind("<Button-1>", self._on_tree_click)
         self.tree.bind("<Double-1>", self._on_double_click)
+        self.tree.bind("<<TreeviewSelect>>", self._on_tree_select)
+    
+    def _create_details_pane(self):
+        """Create the details pane for the focused video"""
+        details = tk.LabelFrame(self.root, text="Chi tiết")
+        details.grid(row=6, column=7, padx=(0, 10), pady=10, sticky='nsew')
+        
+        self.details_image = tk.Label(details)
+        self.details_image.pack(padx=5, pady=5)
+        self.details_labels: Dict[str, tk.Label] = {}
+        for key in ("title", "uploader", "views", "duration", "formats"):
+            label = tk.Label(details, anchor="w", justify="left", wraplength=220)
+            label.pack(fill="x", padx=5, pady=1)
+            self.details_labels[key] = label
     
     def _create_buttons(self):
         """Create button section"""
         btn_frame = tk.Frame(self.root)
-        btn_frame.grid(row=7, column=0, columnspan=7, pady=10)
+        btn_frame.grid(row=7, column=0, columnspan=8, pady=10)
         
         buttons = [
             ("Phân tích", self._analyze_urls),
             ("Tải xuống", self._download_selected),
             ("Tạm dừng / Tiếp tục", self._toggle_pause),
+            ("Huỷ tải", self._cancel_selected),
             ("Tải lại lỗi", self._retry_failed_downloads),
             ("Chọn tất cả", self._select_all),
             ("Bỏ chọn tất cả", self._deselect_all),
@@ -313,10 +990,18 @@ class YouTubeDownloaderApp:
     def _create_status_section(self):
         """Create status section with progress bar"""
         self.status_label = tk.Label(self.root, text="Sẵn sàng", anchor="w")
-        self.status_label.grid(row=8, column=0, columnspan=7, sticky="ew", padx=10)
+        self.status_label.grid(row=8, column=0, columnspan=4, sticky="ew", padx=10)
+        
+        stats_frame = tk.Frame(self.root)
+        stats_frame.grid(row=8, column=4, columnspan=4, sticky="e", padx=10)
+        self.disk_label = tk.Label(stats_frame, text="", anchor="e")
+        self.disk_label.pack(side='right')
+        self.concurrency_label = tk.Label(stats_frame, text="", anchor="e")
+        self.concurrency_label.pack(side='right', padx=(0, 15))
+        self._update_concurrency_label(self.concurrency.limit, self.concurrency.reason)
         
         self.progress = ttk.Progressbar(self.root, mode='determinate')
-        self.progress.grid(row=9, column=0, columnspan=7, sticky='ew', padx=10, pady=(0, 10))
+        self.progress.grid(row=9, column=0, columnspan=8, sticky='ew', padx=10, pady=(0, 10))
         self.progress.grid_remove()  # Hide initially
     
     def _configure_grid(self):
@@ -329,44 +1014,44 @@ class YouTubeDownloaderApp:
         folder = filedialog.askdirectory()
         if folder:
             self.folder_var.set(folder)
+            self._update_disk_label()
     
     def _analyze_urls(self):
-        """Start URL analysis in a separate thread"""
-        threading.Thread(target=self._analyze_urls_worker, daemon=True).start()
-    
-    def _analyze_urls_worker(self):
-        """Worker function for URL analysis"""
-        self._show_progress("Đang phân tích URL...")
+        """Validate the URL box and hand analysis to the orchestrator"""
+        raw_urls = self.url_text.get("1.0", tk.END).strip().splitlines()
+        valid_urls, invalid_urls = URLValidator.validate_and_clean_urls(raw_urls)
+        
+        if invalid_urls:
+            messagebox.showwarning(
+                "Link không hợp lệ",
+                f"Có {len(invalid_urls)} link không hợp lệ đã bị bỏ qua:\n" + 
+                "\n".join(invalid_urls[:5]) + ("..." if len(invalid_urls) > 5 else "")
+            )
         
+        if not valid_urls:
+            messagebox.showwarning(
+                "Không có URL hợp lệ",
+                "Vui lòng nhập ít nhất một URL YouTube hợp lệ."
+            )
+            return
+        
+        # Clear existing videos
+        self._clear_video_list()
+        self._show_progress("Đang phân tích URL...")
+        self.orchestrator.submit(self._analyze_urls_task(valid_urls))
+    
+    async def _analyze_urls_task(self, valid_urls: List[str]):
+        """Analyze URLs one by one without blocking the event loop"""
         try:
-            raw_urls = self.url_text.get("1.0", tk.END).strip().splitlines()
-            valid_urls, invalid_urls = URLValidator.validate_and_clean_urls(raw_urls)
-            
-            if invalid_urls:
-                self.root.after(0, lambda: messagebox.showwarning(
-                    "Link không hợp lệ",
-                    f"Có {len(invalid_urls)} link không hợp lệ đã bị bỏ qua:\n" + 
-                    "\n".join(invalid_urls[:5]) + ("..." if len(invalid_urls) > 5 else "")
-                ))
-            
-            if not valid_urls:
-                self.root.after(0, lambda: messagebox.showwarning(
-                    "Không có URL hợp lệ",
-                    "Vui lòng nhập ít nhất một URL YouTube hợp lệ."
-                ))
-                return
-            
-            # Clear existing videos
-            self._clear_video_list()
-            
             # Process each URL
             total_urls = len(valid_urls)
             for i, url in enumerate(valid_urls, 1):
+                await self.orchestrator.wait_resumed()
                 self.root.after(0, lambda i=i, total=total_urls: self._update_status(
                     f"Đang xử lý URL {i}/{total}..."
                 ))
                 
-                self._process_url(url)
+                await self.orchestrator.run_analysis(self._process_url, url)
             
             # Final status update
             total_videos = len(self.videos)
@@ -431,7 +1116,8 @@ class YouTubeDownloaderApp:
             self.mode_var.get() == "playlist"
         )
     
-    def _extract_playlist_info(self, url: str) -> List[dict]:
+    def _extract_playlist_info(self, url: str, notify: bool = True) -> List[dict]:
+        """Extract and queue the videos of a playlist; notify=False skips the info dialogs"""
         ydl_opts = {
             'quiet': False,
             'skip_download': True,
@@ -461,37 +1147,38 @@ class YouTubeDownloaderApp:
                 if not playlist_info:
                     return []
 
-                entries = playlist_info.get('entries', [])
+                entries = list(playlist_info.get('entries') or [])
                 total = len(entries)
 
-                self.root.after(0, lambda: messagebox.showinfo(
-                "Playlist phát hiện",
-                f"Playlist có {total} video."
-            ))
+                if notify:
+                    self.root.after(0, partial(
+                        messagebox.showinfo, "Playlist phát hiện", f"Playlist có {total} video."
+                    ))
 
-            # Lấy giới hạn từ Combobox
-            limit_str = self.playlist_limit_var.get()
-            if limit_str == "Tất cả" and total > 500:
-                self.root.after(0, lambda: messagebox.showwarning(
-                "Cảnh báo hiệu năng",
-                f"Playlist có {total} video.\nTải toàn bộ có thể mất nhiều thời gian hoặc làm chậm ứng dụng."
-            ))
-                
-                try:
-                    limit = int(limit_str)
-                    if total > limit:
-                        self.root.after(0, lambda: messagebox.showwarning(
-                            "Giới hạn playlist",
-                            f"Chỉ tải {limit} video đầu tiên trong số {total} video."
+                # Lấy giới hạn từ Combobox
+                limit_str = self.playlist_limit_var.get()
+                if limit_str == "Tất cả":
+                    if total > 500 and notify:
+                        self.root.after(0, partial(
+                            messagebox.showwarning, "Cảnh báo hiệu năng",
+                            f"Playlist có {total} video.\nTải toàn bộ có thể mất nhiều thời gian hoặc làm chậm ứng dụng."
                         ))
-                        entries = entries[:limit]
-                        total = limit
-                except ValueError:
-                    self.logger.warning("Không thể đọc giới hạn playlist từ Combobox.")
+                else:
+                    try:
+                        limit = int(limit_str)
+                        if total > limit:
+                            if notify:
+                                self.root.after(0, partial(
+                                    messagebox.showwarning, "Giới hạn playlist",
+                                    f"Chỉ tải {limit} video đầu tiên trong số {total} video."
+                                ))
+                            entries = entries[:limit]
+                            total = limit
+                    except ValueError:
+                        self.logger.warning("Không thể đọc giới hạn playlist từ Combobox.")
 
                 for index, entry in enumerate(entries):
-                    while not self.pause_event.is_set():
-                        time.sleep(0.1)
+                    self.pause_event.wait()
 
                     if not entry or not entry.get('url'):
                         continue
@@ -502,17 +1189,9 @@ class YouTubeDownloaderApp:
                         if not video_info or 'id' not in video_info:
                             continue
 
-                        video = VideoInfo(
-                            id=video_info['id'],
-                            title=self._clean_title(video_info.get('title', "Không rõ")),
-                            duration=self._format_duration(video_info.get("duration", 0)),
-                            url=f"https://www.youtube.com/watch?v={video_info['id']}"
-                        )
+                        video = self._video_from_info(video_info)
 
-                        if video.id not in self.videos:
-                            self.videos[video.id] = video
-                            self.selected_items.add(video.id)
-                            self.root.after(0, self._add_video_to_tree, video)
+                        self._queue_videos([video])
 
                         # Cập nhật tiến độ
                         progress = (index + 1) / total * 100
@@ -528,7 +1207,7 @@ class YouTubeDownloaderApp:
 
         except Exception as e:
             self.logger.error(f"Lỗi khi trích xuất playlist {url}: {e}")
-            self.root.after(0, lambda: self._update_status(f"Lỗi quét playlist: {str(e)[:50]}..."))
+            self.root.after(0, partial(self._update_status, f"Lỗi quét playlist: {str(e)[:50]}..."))
             return []
     
     def _extract_single_video_info(self, url: str) -> List[dict]:
@@ -543,18 +1222,167 @@ class YouTubeDownloaderApp:
         try:
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
                 info = ydl.extract_info(url, download=False)
-                return [info] if info and info.get('id') else []
+                if not info or not info.get('id'):
+                    return []
+            
+            self._queue_videos([self._video_from_info(info)])
+            return [info]
         except Exception as e:
             self.logger.error(f"Error extracting video info {url}: {e}")
             return []
     
+    def _video_from_info(self, info: dict) -> VideoInfo:
+        """Build a VideoInfo from a yt-dlp info dict"""
+        duration = int(info.get("duration") or 0)
+        formats = info.get('formats') or []
+        heights = sorted({f['height'] for f in formats if f.get('height')}, reverse=True)
+        return VideoInfo(
+            id=info['id'],
+            title=self._clean_title(info.get('title', "Không rõ")),
+            duration=self._format_duration(duration),
+            url=URLValidator.canonical_url("video", info['id']),
+            duration_seconds=duration,
+            estimated_sizes=self._estimate_download_sizes(info),
+            uploader=info.get('uploader') or info.get('channel') or "",
+            view_count=int(info.get('view_count') or 0),
+            thumbnail=info.get('thumbnail') or "",
+            formats=[f"{height}p" for height in heights]
+        )
+    
+    def _estimate_download_sizes(self, info: dict) -> Dict[str, int]:
+        """Estimate download size per quality option from the formats yt-dlp returned"""
+        formats = info.get('formats') or []
+        
+        def size_of(fmt: dict) -> int:
+            return fmt.get('filesize') or fmt.get('filesize_approx') or 0
+        
+        audio_size = max((size_of(f) for f in formats
+                          if f.get('vcodec') == 'none' and f.get('acodec') not in (None, 'none')), default=0)
+        sizes = {}
+        for quality, height in self.QUALITY_HEIGHTS.items():
+            video_size = max((size_of(f) for f in formats
+                              if f.get('acodec') == 'none' and f.get('vcodec') not in (None, 'none')
+                              and (f.get('height') or 0) <= height), default=0)
+            if video_size:
+                sizes[quality] = video_size + audio_size
+        if audio_size:
+            # File mp3 192kbps được ghi thêm sau khi chuyển đổi
+            sizes["mp3"] = audio_size + int(info.get("duration") or 0) * 192_000 // 8
+        return sizes
+    
+    def _queue_videos(self, videos: List[VideoInfo]) -> int:
+        """Register new videos (skipping known IDs) and add them to the treeview in one batch"""
+        new_videos = []
+        for video in videos:
+            if video.id not in self.videos:
+                self.videos[video.id] = video
+                self.selected_items.add(video.id)
+                new_videos.append(video)
+        
+        if new_videos:
+            self.root.after(0, self._add_videos_to_tree, new_videos)
+        return len(new_videos)
+    
     def _add_video_to_tree(self, video: VideoInfo):
         """Add video to treeview"""
+        if self.tree.exists(video.id):
+            return
         self.tree.insert('', 'end', iid=video.id, values=(
             "✓", video.id, video.title, video.duration, 
             video.status, video.progress, video.size
         ))
     
+    def _add_videos_to_tree(self, videos: List[VideoInfo]):
+        """Add a batch of videos to treeview"""
+        for video in videos:
+            self._add_video_to_tree(video)
+        self._schedule_prefetch()
+    
+    def _schedule_prefetch(self):
+        """Debounce thumbnail prefetch after scrolling or inserting rows"""
+        if Image is None or self._prefetch_after is not None:
+            return
+        self._prefetch_after = self.root.after(self.PREFETCH_DEBOUNCE_MS, self._prefetch_visible)
+    
+    def _prefetch_visible(self):
+        """Queue thumbnails for visible and about-to-be-visible rows"""
+        self._prefetch_after = None
+        children = self.tree.get_children()
+        if not children:
+            return
+        
+        first, last = self.tree.yview()
+        start = int(first * len(children))
+        end = min(len(children), int(last * len(children)) + 1 + self.PREFETCH_AHEAD)
+        wanted = [video_id for video_id in children[start:end]
+                  if video_id in self.videos and video_id not in self.row_photos
+                  and video_id not in self._thumb_pending]
+        self._request_thumbnails(wanted)
+    
+    def _request_thumbnails(self, video_ids: List[str]):
+        """Decode thumbnails in the background and hand them to Tk when ready"""
+        jobs = [(video_id, ThumbnailCache.url_for(self.videos[video_id])) for video_id in video_ids]
+        jobs = [(video_id, url) for video_id, url in jobs if not self.thumbnail_cache.has_failed(video_id, url)]
+        if not jobs:
+            return
+        self._thumb_pending.update(video_id for video_id, _ in jobs)
+        
+        async def fetch(video_id: str, url: str):
+            images = await self.orchestrator.loop.run_in_executor(
+                self.thumbnail_executor, self.thumbnail_cache.load, video_id, url
+            )
+            self.root.after(0, self._apply_thumbnail, video_id, images)
+        
+        async def fetch_all():
+            await asyncio.gather(*(fetch(video_id, url) for video_id, url in jobs))
+        
+        self.orchestrator.submit(fetch_all())
+    
+    def _apply_thumbnail(self, video_id: str, images: Optional[tuple]):
+        """Attach decoded thumbnails to a row (Tk thread)"""
+        self._thumb_pending.discard(video_id)
+        if images is None or not self.tree.exists(video_id):
+            return
+        
+        photo = ImageTk.PhotoImage(images[0])
+        self.row_photos[video_id] = photo
+        self.row_photos.move_to_end(video_id)
+        self.tree.item(video_id, image=photo)
+        while len(self.row_photos) > self.MAX_ROW_PHOTOS:
+            old_id, _ = self.row_photos.popitem(last=False)
+            if self.tree.exists(old_id):
+                self.tree.item(old_id, image="")
+        
+        if self.tree.focus() == video_id:
+            self._show_details_image(images[1])
+    
+    def _on_tree_select(self, event):
+        """Show details of the focused row"""
+        video = self.videos.get(self.tree.focus())
+        if not video:
+            return
+        
+        labels = self.details_labels
+        labels["title"].config(text=video.title)
+        labels["uploader"].config(text=f"Kênh: {video.uploader or '--'}")
+        labels["views"].config(text=f"Lượt xem: {video.view_count:,}".replace(",", ".") if video.view_count else "Lượt xem: --")
+        labels["duration"].config(text=f"Thời lượng: {video.duration}")
+        labels["formats"].config(text=f"Định dạng: {', '.join(video.formats) if video.formats else '--'}")
+        
+        if Image is None:
+            return
+        images = self.thumbnail_cache.get(video.id)
+        if images:
+            self._show_details_image(images[1])
+        else:
+            self.details_image.config(image="")
+            if video.id not in self._thumb_pending:
+                self._request_thumbnails([video.id])
+    
+    def _show_details_image(self, image):
+        self.details_photo = ImageTk.PhotoImage(image)
+        self.details_image.config(image=self.details_photo)
+    
     def _download_selected(self):
         """Start downloading selected videos"""
         if not self.folder_var.get():
@@ -566,80 +1394,188 @@ class YouTubeDownloaderApp:
             messagebox.showwarning("Chưa chọn video", "Vui lòng chọn ít nhất một video để tải.")
             return
         
-        threading.Thread(target=self._download_worker, args=(selected_videos,), daemon=True).start()
+        self._start_downloads(selected_videos)
     
-    def _download_worker(self, video_ids: List[str]):
-        """Worker function for downloading videos"""
+    def _start_downloads(self, video_ids: List[str]):
+        """Hand a batch of downloads to the orchestrator with the current settings"""
+        self.orchestrator.submit(self._download_batch(video_ids, self.quality_var.get(), self.folder_var.get()))
+    
+    async def _download_batch(self, video_ids: List[str], quality: str, folder: str):
+        """Admit jobs in order and collect them in the order they actually finish"""
+        if self.job_queue is not None:
+            await self._download_batch_on_queue(video_ids, quality, folder)
+            return
+        
         self.progress_tracker.reset()
-        self._show_progress("Bắt đầu tải...")
+        self.root.after(0, self._show_progress, "Bắt đầu tải...")
+        self.cancelled_ids.difference_update(video_ids)
         
-        futures = []
+        jobs = []
         for video_id in video_ids:
-            while not self.pause_event.is_set():
-                time.sleep(0.1)
-
-            if video_id in self.videos:
-                future = self.executor.submit(self._download_single_video, video_id)
-                futures.append(future)
+            if video_id not in self.videos:
+                continue
+            
+            await self.orchestrator.acquire_slot()
+            await self.orchestrator.wait_resumed()
+            if not await self._reserve_disk_space(video_id, quality, folder):
+                self.orchestrator.release_slot()
+                continue
+            
+            self.root.after(0, self._update_disk_label)
+            jobs.append(asyncio.ensure_future(self._download_job(video_id, quality, folder)))
         
-        # Wait for all downloads to complete
-        for future in futures:
-            try:
-                future.result()
-            except Exception as e:
-                self.logger.error(f"Download error: {e}")
+        for job in asyncio.as_completed(jobs):
+            video_id, status = await job
+            self.logger.info(f"Download finished {video_id}: {status}")
         
         self.root.after(0, lambda: self._update_status("Tải xuống hoàn tất"))
         self.root.after(0, self._hide_progress)
     
-    def _download_single_video(self, video_id: str):
-        """Download a single video"""
-        video = self.videos[video_id]
-        self._update_video_status(video_id, "Đang tải")
+    async def _download_batch_on_queue(self, video_ids: List[str], quality: str, folder: str):
+        """Push a batch to the shared job queue and mirror worker progress until it finishes
         
-        try:
-            quality = self.quality_var.get()
-            folder = self.folder_var.get()
-            
-            if quality == "mp3":
-                ydl_opts = {
-                    'format': 'bestaudio/best',
-                    'outtmpl': os.path.join(folder, '%(title)s.%(ext)s'),
-                    'progress_hooks': [self._create_progress_hook(video_id)],
-                    'postprocessors': [{
-                        'key': 'FFmpegExtractAudio',
-                        'preferredcodec': 'mp3',
-                        'preferredquality': '192',
-                    }],
-                }
-            else:
-                ydl_opts = {
-                    'format': f'bestvideo[height<={quality[:-1]}]+bestaudio/best',
-                    'outtmpl': os.path.join(folder, '%(title)s.%(ext)s'),
-                    'progress_hooks': [self._create_progress_hook(video_id)],
-                }
-            
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([video.url])
+        Workers take jobs as they free up, so disk admission (DiskSpaceGuard) and the
+        adaptive concurrency limit do not apply here; parallelism is the number of workers.
+        """
+        self.progress_tracker.reset()
+        self.root.after(0, self._show_progress, "Đang giao việc cho worker...")
+        self.cancelled_ids.difference_update(video_ids)
+        
+        pending = {video_id for video_id in video_ids if video_id in self.videos}
+        for video_id in pending:
+            await self.orchestrator.run_analysis(
+                self.job_queue.enqueue, video_id, self.videos[video_id].url, quality, folder
+            )
+        
+        last_seen: Dict[str, tuple] = {}
+        while pending:
+            rows = await self.orchestrator.run_analysis(self.job_queue.fetch, list(pending), quality, folder)
+            for row in rows:
+                video_id = row["video_id"]
+                state = (row["status"], row["downloaded"], row["total"])
+                previous = last_seen.get(video_id)
+                if previous == state:
+                    continue
+                last_seen[video_id] = state
+                
+                status = self.QUEUE_STATUSES.get(row["status"], row["status"])
+                if row["status"] == "running" and row["total"]:
+                    overall = self.progress_tracker.update_progress(video_id, row["downloaded"], row["total"])
+                    percent = f"{int(row['downloaded'] * 100 / row['total'])}%"
+                    self.events.publish({
+                        "type": "progress", "id": video_id, "progress": percent,
+                        "downloaded_bytes": row["downloaded"], "total_bytes": row["total"],
+                        "overall_progress": round(overall, 1)
+                    }, coalesce_key=video_id)
+                    self.root.after(0, self._update_video_progress, video_id, percent, row["total"], overall)
+                if previous is None or previous[0] != row["status"]:
+                    self._update_video_status(video_id, status)
+                if row["status"] in JobQueue.TERMINAL_STATUSES:
+                    pending.discard(video_id)
+                    self.logger.info(f"Queue job finished {video_id}: {row['status']} {row['error'] or ''}")
             
-            self._update_video_status(video_id, "Hoàn tất")
+            if pending:
+                await asyncio.sleep(self.QUEUE_POLL_SECONDS)
+        
+        self.root.after(0, lambda: self._update_status("Tải xuống hoàn tất"))
+        self.root.after(0, self._hide_progress)
+    
+    async def _reserve_disk_space(self, video_id: str, quality: str, folder: str) -> bool:
+        """Hold a job until its estimated size fits on disk; False if cancelled or it can never fit"""
+        # SQLite và disk_usage có thể chặn lâu: không chạy trên event loop
+        stored = await self.orchestrator.run_analysis(self.media_store.lookup, MediaStore.make_key(video_id, quality))
+        if stored:
+            needed = 0  # Đã có trong kho: chỉ tạo liên kết, không tải lại
+        else:
+            needed = self.disk_guard.estimate(self.videos[video_id], quality)
+        while video_id not in self.cancelled_ids:
+            if await self.orchestrator.run_analysis(self.disk_guard.try_reserve, video_id, needed, folder):
+                return True
+            if self.disk_guard.idle():
+                # Không còn job nào giữ chỗ: chờ thêm cũng không đủ, bỏ qua để các job sau được tải
+                self._update_video_status(video_id, "Không đủ dung lượng")
+                self.logger.warning(f"Skipping {video_id}: needs {needed} bytes, disk too small")
+                return False
+            self._update_video_status(video_id, "Chờ dung lượng")
+            self.root.after(0, partial(self._update_status,
+                f"Không đủ dung lượng trống, tạm giữ {video_id} ({needed / (1024 * 1024):.0f} MB)"))
+            self.root.after(0, self._update_disk_label)
+            await self.orchestrator.wait_space_changed(self.DISK_RECHECK_SECONDS)
+        self._update_video_status(video_id, "Đã huỷ")
+        return False
+    
+    async def _download_job(self, video_id: str, quality: str, folder: str) -> tuple[str, str]:
+        """Run one admitted download with retries, then free its slot and disk reservation"""
+        try:
+            for attempt in range(self.MAX_DOWNLOAD_RETRIES + 1):
+                await self.orchestrator.wait_resumed()
+                if video_id in self.cancelled_ids:
+                    break
+                try:
+                    await self.orchestrator.run_download(self._download_single_video, video_id, quality, folder)
+                    status = "Hoàn tất"
+                    self._update_video_status(video_id, status)
+                    return video_id, status
+                except Exception as e:
+                    if video_id in self.cancelled_ids:
+                        break
+                    self.logger.error(f"Error downloading {video_id} (attempt {attempt + 1}): {e}")
+                    # Lỗi cố định (video riêng tư, bị xoá...) thử lại cũng vô ích
+                    transient = AdaptiveConcurrency.TRANSIENT_ERROR_PATTERN.search(str(e))
+                    if not transient or attempt == self.MAX_DOWNLOAD_RETRIES:
+                        status = "Lỗi"
+                        self._update_video_status(video_id, status)
+                        return video_id, status
+                    self._update_video_status(video_id, f"Thử lại {attempt + 1}")
+                    await asyncio.sleep(self.RETRY_DELAY_SECONDS * 2 ** attempt)
             
-        except Exception as e:
-            self.logger.error(f"Error downloading {video_id}: {e}")
-            self._update_video_status(video_id, "Lỗi")
+            status = "Đã huỷ"
+            self._update_video_status(video_id, status)
+            return video_id, status
+        finally:
+            self.concurrency.record_job_ended(video_id)
+            self.disk_guard.release(video_id)
+            self.orchestrator.notify_space_changed()
+            self.orchestrator.release_slot()
+            self.root.after(0, self._update_disk_label)
+    
+    def _download_single_video(self, video_id: str, quality: str, folder: str):
+        """Download a single video (blocking, runs on the download executor; raises on failure)"""
+        video = self.videos[video_id]
+        self._update_video_status(video_id, "Đang tải")
+        
+        download_video(
+            video.url, video_id, quality, folder, self.media_store,
+            self._create_progress_hook(video_id), YtdlpLogger(self.logger, self.concurrency, video_id)
+        )
+        # Bản dùng lại từ kho không qua progress hook
+        self.root.after(0, lambda: self.tree.set(video_id, "Tiến độ", "100%") if self.tree.exists(video_id) else None)
     
     def _create_progress_hook(self, video_id: str):
         """Create progress hook for a specific video"""
         def hook(d):
+            if video_id in self.cancelled_ids:
+                raise yt_dlp.utils.DownloadCancelled(f"{video_id} đã bị huỷ")
+            
             if d['status'] == 'downloading':
                 downloaded = d.get('downloaded_bytes', 0)
                 total = d.get('total_bytes') or d.get('total_bytes_estimate') or 0
                 
                 # Update progress tracker
+                self.disk_guard.update_written(video_id, d.get('filename', ''), downloaded)
+                self.concurrency.record_progress(
+                    video_id, (d.get('info_dict') or {}).get('url', ''), d.get('filename', ''), downloaded,
+                    d.get('elapsed')
+                )
                 overall_progress = self.progress_tracker.update_progress(video_id, downloaded, total)
                 
                 # Extract percentage
                 percent_str = self._extract_percentage(d.get('_percent_str', ''))
+                self.events.publish({
+                    "type": "progress", "id": video_id, "progress": percent_str,
+                    "downloaded_bytes": downloaded, "total_bytes": total,
+                    "overall_progress": round(overall_progress, 1)
+                }, coalesce_key=video_id)
                 
                 # Update UI in main thread
                 self.root.after(0, lambda: self._update_video_progress(
@@ -647,6 +1583,7 @@ class YouTubeDownloaderApp:
                 ))
                 
             elif d['status'] == 'finished':
+                self.concurrency.record_finished(video_id, d.get('filename', ''))
                 self.root.after(0, lambda: self.tree.set(video_id, "Tiến độ", "100%"))
         
         return hook
@@ -658,6 +1595,12 @@ class YouTubeDownloaderApp:
     
     def _update_video_progress(self, video_id: str, percent: str, total_bytes: int, overall_progress: float):
         """Update video progress in UI"""
+        video = self.videos.get(video_id)
+        if video:
+            video.progress = percent
+            if total_bytes > 0:
+                video.size = f"{round(total_bytes / (1024 * 1024), 2)} MB"
+        
         if self.tree.exists(video_id):
             self.tree.set(video_id, "Tiến độ", percent)
             
@@ -673,6 +1616,10 @@ class YouTubeDownloaderApp:
     
     def _update_video_status(self, video_id: str, status: str):
         """Update video status in UI"""
+        video = self.videos.get(video_id)
+        if video:
+            video.status = status
+        self.events.publish({"type": "status", "id": video_id, "status": status})
         self.root.after(0, lambda: self.tree.set(video_id, "Trạng thái", status) if self.tree.exists(video_id) else None)
     
     def _on_tree_click(self, event):
@@ -690,13 +1637,91 @@ class YouTubeDownloaderApp:
             if messagebox.askyesno("Xoá", f"Xoá video '{self.videos[item].title}'?"):
                 self._remove_video(item)
 
+    def _cancel_selected(self):
+        """Cancel the selected downloads, or every download after confirmation"""
+        selected_videos = [vid for vid in self.selected_items if vid in self.videos]
+        if selected_videos:
+            self.cancel_downloads(selected_videos)
+        elif messagebox.askyesno("Huỷ tải", "Chưa chọn video nào. Huỷ tất cả các lượt tải?"):
+            self.cancel_downloads()
+        else:
+            return
+        self._update_status("Đã yêu cầu huỷ tải")
+    
     def _toggle_pause(self):
-        if self.pause_event.is_set():
+        self._set_paused(self.pause_event.is_set())
+    
+    def _set_paused(self, paused: bool):
+        """Pause or resume queued work (Tk thread)"""
+        if paused:
             self.pause_event.clear()
             self._update_status("⏸ Đã tạm dừng")
         else:
             self.pause_event.set()
             self._update_status("▶️ Tiếp tục")
+        self.orchestrator.set_paused(paused)
+        if self.job_queue is not None:
+            self.orchestrator.submit(self.orchestrator.run_analysis(self.job_queue.set_paused, paused))
+        self.events.publish({"type": "paused", "paused": paused})
+    
+    # --- Các hàm dùng chung cho LocalAPIServer (gọi từ luồng khác) ---
+    
+    def status_snapshot(self) -> dict:
+        """Current job state as plain JSON-serializable data"""
+        return {
+            "paused": not self.pause_event.is_set(),
+            "concurrency": {"limit": self.concurrency.limit, "reason": self.concurrency.reason},
+            "videos": [
+                {"id": v.id, "title": v.title, "duration": v.duration, "url": v.url,
+                 "status": v.status, "progress": v.progress, "size": v.size}
+                for v in list(self.videos.values())
+            ],
+        }
+    
+    def analyze_urls(self, urls: List[str]) -> dict:
+        """Analyze URLs in the background without touching the URL text box"""
+        valid_urls, invalid_urls = URLValidator.validate_and_clean_urls(urls)
+        
+        async def analyze():
+            for url in valid_urls:
+                await self.orchestrator.wait_resumed()
+                await self.orchestrator.run_analysis(self._process_url, url)
+        
+        if valid_urls:
+            self.orchestrator.submit(analyze())
+        return {"accepted": valid_urls, "invalid": invalid_urls}
+    
+    def enqueue_downloads(self, urls: List[str]) -> dict:
+        """Queue video URLs or IDs and start downloading them with the current GUI settings"""
+        if not self.folder_var.get():
+            raise ValueError("Chưa chọn thư mục lưu")
+        
+        video_ids, invalid = [], []
+        for url in urls:
+            key = ("video", url) if URLValidator.VIDEO_ID_PATTERN.match(url) else URLValidator.parse_url(url)
+            if key is None or key[0] != "video":
+                invalid.append(url)
+                continue
+            if key[1] not in video_ids:
+                video_ids.append(key[1])
+        
+        self._queue_videos([
+            VideoInfo(id=video_id, title="Chưa phân tích", duration=self._format_duration(0),
+                      url=URLValidator.canonical_url("video", video_id))
+            for video_id in video_ids
+        ])
+        if video_ids:
+            self._start_downloads(video_ids)
+        return {"queued": video_ids, "invalid": invalid}
+    
+    def cancel_downloads(self, video_ids: Optional[List[str]] = None) -> dict:
+        """Cancel the given downloads, or every known video when no IDs are given"""
+        targets = list(self.videos) if video_ids is None else video_ids
+        self.cancelled_ids.update(targets)
+        self.orchestrator.call_soon(self.orchestrator.notify_space_changed)
+        if self.job_queue is not None:
+            self.orchestrator.submit(self.orchestrator.run_analysis(self.job_queue.cancel, targets))
+        return {"cancelled": targets}
 
     def _retry_failed_downloads(self):
         failed_ids = [vid_id for vid_id, video in self.videos.items() if video.status == "Lỗi"]
@@ -704,7 +1729,7 @@ class YouTubeDownloaderApp:
             messagebox.showinfo("Thông báo", "Không có video lỗi để tải lại.")
             return
         self._update_status(f"Đang tải lại {len(failed_ids)} video bị lỗi...")
-        threading.Thread(target=self._download_worker, args=(failed_ids,), daemon=True).start()
+        self._start_downloads(failed_ids)
     
     def _toggle_selection(self, video_id: str):
         """Toggle video selection"""
@@ -742,6 +1767,7 @@ class YouTubeDownloaderApp:
         if video_id in self.videos:
             del self.videos[video_id]
         self.selected_items.discard(video_id)
+        self.row_photos.pop(video_id, None)
         if self.tree.exists(video_id):
             self.tree.delete(video_id)
     
@@ -749,6 +1775,7 @@ class YouTubeDownloaderApp:
         """Clear the video list"""
         self.videos.clear()
         self.selected_items.clear()
+        self.row_photos.clear()
         for item in self.tree.get_children():
             self.tree.delete(item)
     
@@ -784,6 +1811,82 @@ class YouTubeDownloaderApp:
             except Exception as e:
                 messagebox.showerror("Lỗi", f"Không thể đọc file: {e}")
     
+    def _bulk_import(self):
+        """Stream a large URL file straight into the video list"""
+        file_path = filedialog.askopenfilename(filetypes=[("Text Files", "*.txt"), ("All Files", "*.*")])
+        if file_path:
+            self._show_progress("Đang nhập danh sách...")
+            self.orchestrator.submit(self.orchestrator.run_analysis(self._bulk_import_worker, file_path))
+    
+    def _bulk_import_worker(self, file_path: str):
+        """Worker function for bulk import: validate, canonicalize and deduplicate line by line"""
+        summary = BulkImportSummary()
+        seen: Set[tuple[str, str]] = {("video", video_id) for video_id in list(self.videos)}
+        batch: List[VideoInfo] = []
+        playlist_urls: List[str] = []
+        
+        try:
+            with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+                for line_no, line in enumerate(f, 1):
+                    if not line.strip():
+                        continue
+                    
+                    key = URLValidator.parse_url(line)
+                    if key is None:
+                        summary.invalid += 1
+                    elif key in seen:
+                        summary.duplicate += 1
+                    else:
+                        seen.add(key)
+                        summary.valid += 1
+                        kind, item_id = key
+                        if kind == "playlist":
+                            summary.playlists += 1
+                            playlist_urls.append(URLValidator.canonical_url(kind, item_id))
+                        else:
+                            # Chưa gọi yt-dlp, tiêu đề thật sẽ được lấy khi tải
+                            batch.append(VideoInfo(
+                                id=item_id,
+                                title="Chưa phân tích",
+                                duration=self._format_duration(0),
+                                url=URLValidator.canonical_url(kind, item_id)
+                            ))
+                            if len(batch) >= self.BULK_IMPORT_BATCH:
+                                self._queue_videos(batch)
+                                batch = []
+                    
+                    if line_no % self.BULK_IMPORT_STATUS_EVERY == 0:
+                        msg = (f"Đang nhập: {line_no} dòng - {summary.valid} hợp lệ, "
+                               f"{summary.invalid} không hợp lệ, {summary.duplicate} trùng lặp")
+                        self.root.after(0, partial(self._update_status, msg))
+            
+            if batch:
+                self._queue_videos(batch)
+            
+            # Playlist vẫn cần yt-dlp để liệt kê video, không hiện hộp thoại cho từng playlist
+            for url in playlist_urls:
+                video_infos = self._extract_playlist_info(url, notify=False)
+                if video_infos:
+                    summary.playlist_videos += len(video_infos)
+                else:
+                    summary.playlists_failed += 1
+            
+            msg = (f"Nhập xong: {summary.valid} hợp lệ, {summary.invalid} không hợp lệ, "
+                   f"{summary.duplicate} trùng lặp")
+            if summary.playlists:
+                msg += (f" - {summary.playlists} playlist: {summary.playlist_videos} video"
+                        f", {summary.playlists_failed} không mở rộng được")
+            self.logger.info(f"Bulk import {file_path}: {msg}")
+            self.root.after(0, partial(self._update_status, msg))
+            self.root.after(0, partial(messagebox.showinfo, "Nhập hàng loạt", msg))
+            
+        except Exception as e:
+            self.logger.error(f"Error importing {file_path}: {e}")
+            msg = f"Không thể đọc file: {e}"
+            self.root.after(0, partial(messagebox.showerror, "Lỗi", msg))
+        finally:
+            self.root.after(0, self._hide_progress)
+    
     def _show_progress(self, message: str):
         """Show progress bar with message"""
         self.progress.grid()
@@ -799,6 +1902,27 @@ class YouTubeDownloaderApp:
         """Update status label"""
         self.status_label.config(text=message)
     
+    def _on_concurrency_change(self, limit: int, reason: str):
+        """Report an adaptive concurrency change (called on the orchestrator loop)"""
+        self.logger.info(f"Concurrency limit -> {limit}: {reason}")
+        self.events.publish({"type": "concurrency", "limit": limit, "reason": reason})
+        self.root.after(0, self._update_concurrency_label, limit, reason)
+    
+    def _update_concurrency_label(self, limit: int, reason: str):
+        """Show the current parallel download limit and why it last changed"""
+        if len(reason) > 45:
+            reason = reason[:42] + "..."
+        self.concurrency_label.config(text=f"Luồng tải: {limit} ({reason})")
+    
+    def _update_disk_label(self):
+        """Show reserved and free disk space of the output folder"""
+        folder = self.folder_var.get()
+        if not folder:
+            return
+        reserved, free = self.disk_guard.snapshot(folder)
+        gb = 1024 ** 3
+        self.disk_label.config(text=f"Đã giữ: {reserved / gb:.2f} GB / Trống: {free / gb:.2f} GB")
+    
     @staticmethod
     def _format_duration(seconds: int) -> str:
         """Format duration in HH:MM:SS format"""
@@ -810,22 +1934,588 @@ class YouTubeDownloaderApp:
     
     def __del__(self):
         """Cleanup when object is destroyed"""
+        if hasattr(self, 'orchestrator'):
+            self.orchestrator.stop()
         if hasattr(self, 'executor'):
             self.executor.shutdown(wait=False)
+        if hasattr(self, 'thumbnail_executor'):
+            self.thumbnail_executor.shutdown(wait=False)
+
+
+class YtdlpLogger:
+    """yt-dlp logger that forwards to the app log and reports transient network errors"""
+    
+    def __init__(self, logger: logging.Logger, concurrency: Optional[AdaptiveConcurrency], video_id: str):
+        self.logger = logger
+        self.concurrency = concurrency
+        self.video_id = video_id
+    
+    def debug(self, msg: str):
+        pass
+    
+    def info(self, msg: str):
+        pass
+    
+    def warning(self, msg: str):
+        if self.concurrency:
+            self.concurrency.record_error(self.video_id, msg)
+        self.logger.warning(f"[{self.video_id}] {msg}")
+    
+    def error(self, msg: str):
+        if self.concurrency:
+            self.concurrency.record_error(self.video_id, msg)
+        self.logger.error(f"[{self.video_id}] {msg}")
+
+
+def download_video(url: str, video_id: str, quality: str, folder: str, media_store: MediaStore,
+                   progress_hook, ydl_logger: YtdlpLogger) -> Optional[str]:
+    """Download one video with yt-dlp, or reuse a stored copy; return the output file path"""
+    store_key = MediaStore.make_key(video_id, quality)
+    
+    # Đã có bản tải ở thư mục khác: liên kết/sao chép thay vì tải lại
+    stored_path = media_store.lookup(store_key)
+    if stored_path:
+        try:
+            target = media_store.place(store_key, stored_path, folder)
+            ydl_logger.logger.info(f"Reused {stored_path} for {video_id} -> {target}")
+            return target
+        except OSError as e:
+            ydl_logger.logger.warning(f"Cannot reuse {stored_path} for {video_id}, downloading again: {e}")
+    
+    if quality == "mp3":
+        ydl_opts = {
+            'format': 'bestaudio/best',
+            'outtmpl': os.path.join(folder, '%(title)s.%(ext)s'),
+            'progress_hooks': [progress_hook],
+            'postprocessors': [{
+                'key': 'FFmpegExtractAudio',
+                'preferredcodec': 'mp3',
+                'preferredquality': '192',
+            }],
+        }
+    else:
+        ydl_opts = {
+            'format': f'bestvideo[height<={quality[:-1]}]+bestaudio/best',
+            'outtmpl': os.path.join(folder, '%(title)s.%(ext)s'),
+            'progress_hooks': [progress_hook],
+        }
+    # Gọi với đường dẫn file cuối cùng, sau khi ghép/chuyển đổi xong
+    final_paths: List[str] = []
+    ydl_opts['post_hooks'] = [partial(media_store.add, store_key), final_paths.append]
+    # Bắt các lỗi mạng yt-dlp tự thử lại để điều chỉnh số luồng
+    ydl_opts['logger'] = ydl_logger
+    
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        ydl.download([url])
+    return final_paths[-1] if final_paths else None
+
+
+class JobQueue:
+    """Download job queue in a SQLite file shared by the coordinator and worker processes"""
+    
+    LEASE_SECONDS = 120     # Job của worker không gửi heartbeat quá thời gian này sẽ được giao lại
+    MAX_ATTEMPTS = 3
+    TERMINAL_STATUSES = ("done", "failed", "cancelled")
+    SQL_CHUNK = 500         # Số tham số mỗi câu IN (...), dưới giới hạn biến của SQLite
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    video_id TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    quality TEXT NOT NULL,
+                    folder TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'queued',
+                    worker TEXT,
+                    lease_until REAL DEFAULT 0,
+                    attempts INTEGER DEFAULT 0,
+                    cancel_requested INTEGER DEFAULT 0,
+                    downloaded INTEGER DEFAULT 0,
+                    total INTEGER DEFAULT 0,
+                    error TEXT,
+                    filepath TEXT,
+                    updated REAL,
+                    UNIQUE (video_id, quality, folder)
+                )""")
+            # Hàng đợi tạo bởi bản cũ chưa có cột filepath
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "filepath" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN filepath TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id)")
+            conn.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)")
+    
+    def _connect(self) -> sqlite3.Connection:
+        """One connection per thread; transactions are opened explicitly"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+    
+    def enqueue(self, video_id: str, url: str, quality: str, folder: str) -> bool:
+        """Add a job; failed/cancelled jobs and finished ones whose file is gone are re-queued"""
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO jobs (video_id, url, quality, folder, updated) VALUES (?, ?, ?, ?, ?)",
+                (video_id, url, quality, folder, now)
+            )
+            queued = cursor.rowcount > 0
+            if not queued:
+                row = conn.execute(
+                    "SELECT status, filepath, cancel_requested FROM jobs "
+                    "WHERE video_id = ? AND quality = ? AND folder = ?",
+                    (video_id, quality, folder)
+                ).fetchone()
+                # Người dùng có thể đã xoá file sau khi tải xong
+                file_gone = row["status"] == "done" and not (row["filepath"] and os.path.isfile(row["filepath"]))
+                # Job bị yêu cầu huỷ nhưng không còn worker nào giữ thì claim() sẽ bỏ qua mãi
+                stale_cancel = row["status"] != "running" and row["cancel_requested"]
+                if row["status"] in ("failed", "cancelled") or file_gone or stale_cancel:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'queued', attempts = 0, cancel_requested = 0, error = NULL, "
+                        "filepath = NULL, downloaded = 0, total = 0, updated = ? "
+                        "WHERE video_id = ? AND quality = ? AND folder = ?",
+                        (now, video_id, quality, folder)
+                    )
+                    queued = True
+            conn.execute("COMMIT")
+            return queued
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    
+    def claim(self, worker_id: str) -> Optional[dict]:
+        """Atomically take the oldest queued job, re-queueing jobs whose lease expired"""
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            paused = conn.execute("SELECT value FROM settings WHERE key = 'paused'").fetchone()
+            if paused and paused["value"] == "1":
+                conn.execute("COMMIT")
+                return None
+            
+            conn.execute(
+                "UPDATE jobs SET status = CASE WHEN cancel_requested THEN 'cancelled' ELSE 'queued' END, "
+                "worker = NULL, updated = ? WHERE status = 'running' AND lease_until < ?", (now, now)
+            )
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' AND cancel_requested = 0 ORDER BY id LIMIT 1"
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', worker = ?, lease_until = ?, "
+                    "attempts = attempts + 1, updated = ? WHERE id = ?",
+                    (worker_id, now + self.LEASE_SECONDS, now, row["id"])
+                )
+            conn.execute("COMMIT")
+            return dict(row) if row is not None else None
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    
+    def heartbeat(self, job_id: int, worker_id: str, downloaded: int, total: int) -> bool:
+        """Extend the lease and report progress; False if the job was cancelled or its lease lost"""
+        now = time.time()
+        conn = self._connect()
+        cursor = conn.execute(
+            "UPDATE jobs SET lease_until = ?, downloaded = ?, total = ?, updated = ? "
+            "WHERE id = ? AND worker = ? AND status = 'running'",
+            (now + self.LEASE_SECONDS, downloaded, total, now, job_id, worker_id)
+        )
+        if cursor.rowcount == 0:
+            return False
+        row = conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return not row["cancel_requested"]
+    
+    def finish(self, job_id: int, worker_id: str, error: Optional[str] = None, cancelled: bool = False,
+               filepath: Optional[str] = None):
+        """Record the outcome of a claimed job; transient failures are re-queued until MAX_ATTEMPTS"""
+        now = time.time()
+        conn = self._connect()
+        if error is None or cancelled:
+            conn.execute(
+                "UPDATE jobs SET status = ?, worker = NULL, error = NULL, filepath = ?, updated = ? "
+                "WHERE id = ? AND worker = ?",
+                ("cancelled" if cancelled else "done", filepath, now, job_id, worker_id)
+            )
+        else:
+            # Lỗi cố định (video riêng tư, bị xoá...) thử lại cũng vô ích
+            transient = AdaptiveConcurrency.TRANSIENT_ERROR_PATTERN.search(error)
+            conn.execute(
+                "UPDATE jobs SET status = CASE WHEN cancel_requested THEN 'cancelled' "
+                "WHEN attempts < ? THEN 'queued' ELSE 'failed' END, "
+                "worker = NULL, error = ?, updated = ? WHERE id = ? AND worker = ?",
+                (self.MAX_ATTEMPTS if transient else 0, error[:500], now, job_id, worker_id)
+            )
+    
+    def cancel(self, video_ids: List[str]):
+        """Cancel queued jobs and ask workers to stop running ones"""
+        if not video_ids:
+            return
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # "+status": tra theo video_id (chỉ mục UNIQUE) thay vì quét mọi job cùng trạng thái
+            for start in range(0, len(video_ids), self.SQL_CHUNK):
+                chunk = video_ids[start:start + self.SQL_CHUNK]
+                marks = ",".join("?" * len(chunk))
+                conn.execute(
+                    f"UPDATE jobs SET status = 'cancelled', updated = ? "
+                    f"WHERE video_id IN ({marks}) AND +status = 'queued'",
+                    (now, *chunk)
+                )
+                conn.execute(
+                    f"UPDATE jobs SET cancel_requested = 1, updated = ? "
+                    f"WHERE video_id IN ({marks}) AND +status = 'running'",
+                    (now, *chunk)
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    
+    def set_paused(self, paused: bool):
+        """Stop or resume workers from claiming new jobs"""
+        self._connect().execute(
+            "INSERT OR REPLACE INTO settings (key, value) VALUES ('paused', ?)", ("1" if paused else "0",)
+        )
+    
+    def fetch(self, video_ids: List[str], quality: str, folder: str) -> List[dict]:
+        """Current rows for the given videos of one batch"""
+        rows = []
+        for start in range(0, len(video_ids), self.SQL_CHUNK):
+            chunk = video_ids[start:start + self.SQL_CHUNK]
+            marks = ",".join("?" * len(chunk))
+            rows += self._connect().execute(
+                f"SELECT * FROM jobs WHERE quality = ? AND folder = ? AND video_id IN ({marks})",
+                (quality, folder, *chunk)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+
+class QueueWorker:
+    """Headless worker process: claims jobs from a JobQueue and downloads them"""
+    
+    HEARTBEAT_SECONDS = 5
+    IDLE_MIN_SECONDS = 0.5
+    IDLE_MAX_SECONDS = 5
+    
+    def __init__(self, queue: JobQueue, worker_id: Optional[str] = None):
+        self.queue = queue
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.media_store = MediaStore()
+        self.logger = logging.getLogger(__name__)
+    
+    def run(self):
+        """Process jobs until interrupted"""
+        self.logger.info(f"Worker {self.worker_id} started on {self.queue.path}")
+        idle = self.IDLE_MIN_SECONDS
+        stop = threading.Event()
+        while not stop.is_set():
+            try:
+                job = self.queue.claim(self.worker_id)
+            except sqlite3.Error as e:
+                # Ví dụ "database is locked": chờ rồi thử lại như khi hàng đợi trống
+                self.logger.warning(f"Worker {self.worker_id} cannot claim a job: {e}")
+                job = None
+            if job is None:
+                # Hàng đợi trống: chờ lâu dần để giảm truy vấn SQLite
+                stop.wait(idle)
+                idle = min(idle * 2, self.IDLE_MAX_SECONDS)
+                continue
+            idle = self.IDLE_MIN_SECONDS
+            self._run_job(job)
+    
+    def _run_job(self, job: dict):
+        progress = {"downloaded": 0, "total": 0}
+        streams: Dict[str, tuple[int, int]] = {}
+        cancelled = threading.Event()
+        lease_lost = threading.Event()
+        done = threading.Event()
+        
+        def hook(d):
+            if cancelled.is_set() or lease_lost.is_set():
+                raise yt_dlp.utils.DownloadCancelled(f"{job['video_id']} đã bị huỷ")
+            if d['status'] == 'downloading':
+                total = d.get('total_bytes') or d.get('total_bytes_estimate') or 0
+                streams[d.get('filename', '')] = (d.get('downloaded_bytes', 0), total)
+                progress["downloaded"] = sum(downloaded for downloaded, _ in streams.values())
+                progress["total"] = sum(total for _, total in streams.values())
+        
+        def heartbeat():
+            # Chạy cả khi đang ghép/chuyển đổi (không có progress hook) để giữ lease
+            renewed = time.monotonic()
+            while not done.wait(self.HEARTBEAT_SECONDS):
+                try:
+                    if not self.queue.heartbeat(job["id"], self.worker_id, progress["downloaded"], progress["total"]):
+                        cancelled.set()
+                    renewed = time.monotonic()
+                except Exception as e:
+                    # Ví dụ "database is locked": thử lại ở nhịp sau, chỉ bỏ job khi lease chắc chắn đã hết
+                    self.logger.warning(f"Worker {self.worker_id} heartbeat failed for {job['video_id']}: {e}")
+                    if time.monotonic() - renewed > JobQueue.LEASE_SECONDS:
+                        lease_lost.set()
+        
+        heartbeat_thread = threading.Thread(target=heartbeat, daemon=True)
+        heartbeat_thread.start()
+        filepath, error = None, None
+        try:
+            filepath = download_video(job["url"], job["video_id"], job["quality"], job["folder"],
+                                      self.media_store, hook, YtdlpLogger(self.logger, None, job["video_id"]))
+        except Exception as e:
+            error = str(e)
+        finally:
+            done.set()
+            heartbeat_thread.join()
+        
+        # Lỗi ghi kết quả không được biến lượt tải đã xong thành lỗi tải
+        try:
+            if error is None:
+                self.queue.heartbeat(job["id"], self.worker_id, progress["total"], progress["total"])
+                self.queue.finish(job["id"], self.worker_id, filepath=filepath)
+                self.logger.info(f"Worker {self.worker_id} finished {job['video_id']}")
+            elif lease_lost.is_set():
+                # Job có thể đã được giao cho worker khác; claim() sẽ xếp lại nếu chưa
+                self.logger.warning(f"Worker {self.worker_id} lost the lease on {job['video_id']}")
+            elif cancelled.is_set():
+                self.queue.finish(job["id"], self.worker_id, cancelled=True)
+            else:
+                self.logger.error(f"Worker {self.worker_id} failed {job['video_id']}: {error}")
+                self.queue.finish(job["id"], self.worker_id, error=error)
+        except sqlite3.Error as e:
+            # Lease sẽ hết hạn và claim() xếp lại job; bản đã tải được dùng lại từ kho
+            self.logger.error(f"Worker {self.worker_id} cannot record the result of {job['video_id']}: {e}")
+
+
+class LocalAPIServer:
+    """Localhost-only HTTP/JSON control API with a Server-Sent Events progress stream"""
+    
+    HOST = "127.0.0.1"
+    ALLOWED_HOSTS = {"127.0.0.1", "localhost"}
+    KEEPALIVE_SECONDS = 15
+    MAX_BODY_BYTES = 10 * 1024 * 1024
+    
+    def __init__(self, app: "YouTubeDownloaderApp", port: int):
+        self.app = app
+        self.port = port
+        self.logger = logging.getLogger(__name__)
+        self.routes = {
+            ("GET", "/status"): self._handle_status,
+            ("POST", "/analyze"): self._handle_analyze,
+            ("POST", "/enqueue"): self._handle_enqueue,
+            ("POST", "/pause"): self._handle_pause,
+            ("POST", "/resume"): self._handle_resume,
+            ("POST", "/cancel"): self._handle_cancel,
+        }
+    
+    def start(self):
+        """Start serving on the app's orchestrator loop"""
+        self.app.orchestrator.submit(self._serve())
+    
+    async def _serve(self):
+        self.server = await asyncio.start_server(self._handle_connection, self.HOST, self.port)
+        self.logger.info(f"Local API listening on http://{self.HOST}:{self.port}")
+    
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+            request_line, *header_lines = head.decode("latin-1").split("\r\n")
+            method, target, _ = request_line.split(" ", 2)
+            headers = {}
+            for line in header_lines:
+                if ":" in line:
+                    name, value = line.split(":", 1)
+                    headers[name.strip().lower()] = value.strip()
+            
+            # Chống DNS rebinding: chỉ nhận Host là localhost
+            if headers.get("host", "").rsplit(":", 1)[0] not in self.ALLOWED_HOSTS:
+                await self._send_json(writer, 403, {"error": "forbidden host"})
+                return
+            
+            path = urlparse(target).path
+            if method == "GET" and path == "/events":
+                await self._stream_events(writer)
+                return
+            
+            handler = self.routes.get((method, path))
+            if handler is None:
+                await self._send_json(writer, 404, {"error": "not found"})
+                return
+            
+            body = {}
+            if method == "POST":
+                # Bắt buộc JSON để trình duyệt không gửi được form giả mạo
+                if not headers.get("content-type", "").startswith("application/json"):
+                    await self._send_json(writer, 415, {"error": "content-type must be application/json"})
+                    return
+                length = int(headers.get("content-length", "0"))
+                if length > self.MAX_BODY_BYTES:
+                    await self._send_json(writer, 413, {"error": "body too large"})
+                    return
+                raw = await reader.readexactly(length) if length else b""
+                body = json.loads(raw) if raw else {}
+                if not isinstance(body, dict):
+                    raise ValueError("body must be a JSON object")
+            
+            await self._send_json(writer, 200, await self._call_on_tk(handler, body))
+        except ValueError as e:
+            await self._send_json(writer, 400, {"error": str(e)})
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        except Exception as e:
+            self.logger.error(f"Local API error: {e}")
+            await self._send_json(writer, 500, {"error": str(e)})
+        finally:
+            writer.close()
+    
+    async def _send_json(self, writer: asyncio.StreamWriter, status: int, payload: dict):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode("latin-1") + data
+        )
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+    
+    async def _stream_events(self, writer: asyncio.StreamWriter):
+        """Send a status snapshot, then every job event, as Server-Sent Events"""
+        queue = self.app.events.subscribe()
+        try:
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                         b"Cache-Control: no-cache\r\nConnection: keep-alive\r\n\r\n")
+            snapshot = await self._call_on_tk(self.app.status_snapshot)
+            writer.write(self._format_event({"type": "snapshot", **snapshot}))
+            await writer.drain()
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=self.KEEPALIVE_SECONDS)
+                    writer.write(self._format_event(event))
+                except asyncio.TimeoutError:
+                    writer.write(b": keep-alive\n\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.app.events.unsubscribe(queue)
+    
+    async def _call_on_tk(self, func, *args):
+        """Run func on the Tk thread, since handlers read Tk variables and mutate the video list"""
+        future = Future()
+        
+        def run():
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(func(*args))
+                except Exception as e:
+                    future.set_exception(e)
+        
+        self.app.root.after(0, run)
+        return await asyncio.wrap_future(future)
+    
+    @staticmethod
+    def _format_event(event: dict) -> bytes:
+        return f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8")
+    
+    def _handle_status(self, body: dict) -> dict:
+        return self.app.status_snapshot()
+    
+    def _handle_analyze(self, body: dict) -> dict:
+        return self.app.analyze_urls(self._url_list(body))
+    
+    def _handle_enqueue(self, body: dict) -> dict:
+        return self.app.enqueue_downloads(self._url_list(body))
+    
+    def _handle_pause(self, body: dict) -> dict:
+        self.app._set_paused(True)
+        return {"paused": True}
+    
+    def _handle_resume(self, body: dict) -> dict:
+        self.app._set_paused(False)
+        return {"paused": False}
+    
+    def _handle_cancel(self, body: dict) -> dict:
+        ids = body.get("ids")
+        if ids is not None and not isinstance(ids, list):
+            raise ValueError("ids must be a list")
+        return self.app.cancel_downloads(ids)
+    
+    @staticmethod
+    def _url_list(body: dict) -> List[str]:
+        urls = body.get("urls")
+        if not isinstance(urls, list) or not all(isinstance(url, str) for url in urls):
+            raise ValueError("urls must be a list of strings")
+        return urls
 
 
 def main():
     """Main entry point"""
+    parser = argparse.ArgumentParser(description="YouTube Downloader")
+    parser.add_argument("--api-port", type=int, default=None,
+                        help="Bật API điều khiển cục bộ (127.0.0.1) trên cổng này")
+    parser.add_argument("--queue", default=None,
+                        help="File SQLite làm hàng đợi chung; việc tải được giao cho các worker")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Số worker process chạy kèm trên máy này (cần --queue)")
+    parser.add_argument("--worker", action="store_true",
+                        help="Chạy như worker không giao diện, lấy job từ --queue")
+    args = parser.parse_args()
+    
+    if (args.worker or args.workers) and not args.queue:
+        parser.error("--worker/--workers cần --queue")
+    
+    if args.worker:
+        logging.basicConfig(
+            filename='youtube_downloader.log',
+            level=logging.INFO,
+            format='%(asctime)s - %(levelname)s - %(message)s',
+            encoding='utf-8'
+        )
+        try:
+            QueueWorker(JobQueue(args.queue)).run()
+        except KeyboardInterrupt:
+            pass
+        return
+    
+    job_queue = JobQueue(args.queue) if args.queue else None
+    worker_processes = []
+    for _ in range(args.workers):
+        # Bản đóng gói .exe: sys.executable chính là chương trình
+        command = [sys.executable] if getattr(sys, "frozen", False) else [sys.executable, os.path.abspath(__file__)]
+        worker_processes.append(subprocess.Popen(command + ["--worker", "--queue", args.queue]))
+    
     root = tk.Tk()
-    app = YouTubeDownloaderApp(root)
+    app = YouTubeDownloaderApp(root, job_queue)
+    
+    if args.api_port:
+        LocalAPIServer(app, args.api_port).start()
     
     try:
         root.mainloop()
     except KeyboardInterrupt:
         pass
     finally:
+        for process in worker_processes:
+            process.terminate()
+        if hasattr(app, 'orchestrator'):
+            app.orchestrator.stop()
         if hasattr(app, 'executor'):
             app.executor.shutdown(wait=True)
+        if hasattr(app, 'thumbnail_executor'):
+            app.thumbnail_executor.shutdown(wait=False)
 
 
 if __name__ == "__main__":